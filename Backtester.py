@@ -0,0 +1,132 @@
+import multiprocessing
+from datetime import date
+import numpy as np
+import pandas as pd
+
+from agents import *
+from generators import *
+from Simulator import Simulator
+import config
+
+from CMDataLoader import CMDataLoader
+
+
+# Picklable wrapper for running one backtest window in a worker process
+# Replayed block rewards already reflect difficulty, so it isn't simulated again
+# Miners are stepped in the worker itself; the windows are what run in parallel
+def run_backtest_simulation(env_miners, prices, block_rewards, step_days):
+    sim = Simulator(env_miners, [], [], list(prices), list(block_rewards),
+                    difficulty_adjustment = False,
+                    step_days = step_days,
+                    parallel = False)
+    return sim.run_simulation().global_hash_rate
+
+
+# Replays historical price and block reward windows through Simulator
+# Scores simulated global hash rate against realized HashRate
+class Backtester():
+    def __init__(self,
+                 n_days: int = 100,
+                 lag: int = 30,
+                 lookback_date: str = date.today().strftime('%Y-%m-%d'),
+                 machine_counts: dict = config.machine_counts,
+                 # None keeps every miner on its starting model; a MachineSchedule counts days from its own start date
+                 machine_schedule: MachineSchedule = None,
+                 # See Simulator; steps longer than 1 day are approximate
+                 step_days: int = 1
+                 ):
+        self.n_days = n_days
+        self.lag = lag
+        self.machine_counts = machine_counts
+        self.machine_schedule = machine_schedule
+        self.step_days = step_days
+
+        history = CMDataLoader.get_historical_network_data(lookback_date)
+        self.dates = history.date.to_numpy()
+        self.prices = history.PriceUSD.to_numpy()
+        self.hash_rates = history.HashRate.to_numpy()
+        self.mining_revs_usd = (history.IssTotUSD + history.FeeTotUSD).to_numpy()
+        # BTC paid to miners each day, at realized block production
+        self.mining_revs_btc = self.mining_revs_usd / self.prices
+
+        self.start_dates = []
+        self.simulated_hash_rates = None
+        self.realized_hash_rates = None
+
+    # Indices of given start dates, checking there's enough history on either side
+    def __get_start_indexes(self, start_dates):
+        start_indexes = np.searchsorted(self.dates, start_dates)
+        is_found = (start_indexes < self.dates.size) & (self.dates[np.minimum(start_indexes, self.dates.size - 1)] == np.asarray(start_dates))
+        if not is_found.all():
+            raise ValueError(f"No history for start dates {list(np.asarray(start_dates)[~is_found])}")
+        if (start_indexes < self.lag).any() or (start_indexes + self.n_days >= self.dates.size).any():
+            raise ValueError(f"Start dates need {self.lag} days of history before and {self.n_days} days after")
+        # Early history has no USD metrics
+        windows = [self.__get_windows(self.prices, start_indexes), self.__get_windows(self.mining_revs_btc, start_indexes),
+                   self.__get_windows(self.mining_revs_usd, start_indexes, before_start = True),
+                   self.__get_windows(self.hash_rates, start_indexes, before_start = True)]
+        is_complete = np.all([np.isfinite(window).all(axis = 1) for window in windows], axis = 0)
+        if not is_complete.all():
+            raise ValueError(f"Missing price, revenue or hash rate history for start dates {np.asarray(start_dates)[~is_complete].tolist()}")
+        return start_indexes
+
+    # Rows of values[start:start + n_days + 1] (or the lag days before start), one per start date
+    def __get_windows(self, values, start_indexes, before_start = False):
+        offsets = np.arange(-self.lag + 1, 1) if before_start else np.arange(self.n_days + 1)
+        return values[start_indexes[:, None] + offsets]
+
+    def __generate_env_miners(self, mining_revs_usd, hash_rates):
+        miner_generator = MinerGenerator(lag = self.lag,
+                                         machine_schedule = self.machine_schedule,
+                                         historical_global_mining_rev_usd = pd.Series(mining_revs_usd),
+                                         historical_hash_rate = pd.Series(hash_rates))
+        return miner_generator.generate_miner_distribution(machine_counts_unscaled = self.machine_counts,
+                                                           starting_hashrate = hash_rates[-1])
+
+    # Runs one simulation per start date, all in one batch
+    # Each window is one task on a single process pool, so miners are pickled once per window rather than every step
+    def run_backtests(self, start_dates: list):
+        start_indexes = self.__get_start_indexes(start_dates)
+        prices = self.__get_windows(self.prices, start_indexes)
+        mining_revs_btc = self.__get_windows(self.mining_revs_btc, start_indexes)
+        seed_mining_revs_usd = self.__get_windows(self.mining_revs_usd, start_indexes, before_start = True)
+        seed_hash_rates = self.__get_windows(self.hash_rates, start_indexes, before_start = True)
+
+        env_miners = [self.__generate_env_miners(seed_mining_revs_usd[i], seed_hash_rates[i]) for i in range(len(start_indexes))]
+        # Networks smaller than a few machines round every miner down to none
+        is_empty = np.array([sum([miner.get_hash_rate() for miner in miners]) == 0 for miners in env_miners])
+        if is_empty.any():
+            raise ValueError(f"Hash rate too small for the machine catalog at start dates {np.asarray(start_dates)[is_empty].tolist()}")
+
+        args = [(env_miners[i], prices[i], mining_revs_btc[i], self.step_days) for i in range(len(start_indexes))]
+        with multiprocessing.Pool() as pool:
+            self.simulated_hash_rates = np.array(pool.starmap(run_backtest_simulation, args, chunksize = 1))
+        self.start_dates = list(start_dates)
+        self.realized_hash_rates = self.__get_windows(self.hash_rates, start_indexes)
+        return self.get_scores()
+
+    # Error of simulated against realized hash rate, one row per start date
+    # Log errors are in natural log; days with missing realized data are skipped
+    @staticmethod
+    def score_hash_rates(simulated_hash_rates, realized_hash_rates):
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            log_errors = np.log(simulated_hash_rates) - np.log(realized_hash_rates)
+            return pd.DataFrame({
+                'mape': np.nanmean(np.abs(simulated_hash_rates / realized_hash_rates - 1), axis = 1),
+                'rmse_log': np.sqrt(np.nanmean(log_errors ** 2, axis = 1)),
+                'bias_log': np.nanmean(log_errors, axis = 1),
+                'final_log_error': log_errors[:, -1]
+            })
+
+    def get_scores(self):
+        return self.score_hash_rates(self.simulated_hash_rates, self.realized_hash_rates).assign(start_date = self.start_dates)
+
+    # Simulated and realized hash rate by start date and day, for plotting
+    def get_hash_rates(self):
+        n_starts, n_days = self.simulated_hash_rates.shape
+        return pd.DataFrame({
+            'start_date': np.repeat(self.start_dates, n_days),
+            'day': np.tile(np.arange(n_days), n_starts),
+            'simulated_hash_rate': self.simulated_hash_rates.ravel(),
+            'realized_hash_rate': self.realized_hash_rates.ravel()
+        })
@@ -1,18 +1,34 @@
 import numpy as np
 import pandas as pd
 import requests
-from sklearn.linear_model import LinearRegression
 from datetime import date
 from functools import lru_cache
 
-# Note: pagination not implemented, so don't set lookbacks > 10,000 (>27 years)
+import config
+from estimators import get_calibration_stats
+
+
 class CMDataLoader:
+    # Follows next_page_url until all pages are fetched
+    # Pages from the start, so concatenated pages stay in time order
+    @staticmethod
+    @lru_cache
+    def __get_network_data(metrics: list = ['HashRate', 'IssTotUSD', 'FeeTotUSD', 'PriceUSD', 'FeeMeanNtv', 'BlkCnt'], end_time: str = date.today().strftime('%Y-%m-%d')):
+        api_str = f"{config.coinmetrics_api_url}/timeseries/asset-metrics?assets=btc&metrics={','.join(metrics)}&end_time={end_time}&page_size=10000&paging_from=start&pretty=true"
+        data = []
+        while api_str is not None:
+            response = requests.get(api_str).json()
+            data += response['data']
+            api_str = response.get('next_page_url')
+        return pd.DataFrame(data)
+
+    # Returns daily history up to lookback_date, with numeric metrics and a date column
     @staticmethod
     @lru_cache
-    def __get_network_data(metrics: list = ['HashRate', 'IssTotUSD', 'FeeTotUSD', 'PriceUSD', 'FeeMeanNtv'], end_time: str = date.today().strftime('%Y-%m-%d')):
-        api_str = f"https://community-api.coinmetrics.io/v4/timeseries/asset-metrics?assets=btc&metrics={','.join(metrics)}&end_time={end_time}&page_size=10000&pretty=true"
-        response = requests.get(api_str).json()
-        return pd.DataFrame(response['data'])
+    def get_historical_network_data(lookback_date: str = date.today().strftime('%Y-%m-%d')):
+        values = CMDataLoader.__get_network_data(end_time = lookback_date)
+        metrics = [column for column in values.columns if column not in ['asset', 'time']]
+        return values.assign(date = values.time.str[:10], **{metric: pd.to_numeric(values[metric]) for metric in metrics})
 
     # Returns last lookback days of hash rate, from lookback_date
     @staticmethod
@@ -27,22 +43,38 @@ class CMDataLoader:
         values = CMDataLoader.__get_network_data(end_time = lookback_date)
         return (pd.to_numeric(values.IssTotUSD) + pd.to_numeric(values.FeeTotUSD)).tail(lookback).reset_index(drop = True)
 
+    # Returns calibration stats for each (lookback, lookback_date) pair; the two broadcast together
+    # Stats are arrays of current_price, intercept, drift, se, fee_mean, fee_sigma (see estimators.py)
+    # A single fetch up to the latest lookback_date covers every pair
+    @staticmethod
+    def get_historical_calibration_stats(lookbacks = 100, lookback_dates = date.today().strftime('%Y-%m-%d')):
+        values = CMDataLoader.__get_network_data(end_time = str(max(np.ravel(lookback_dates))))
+        # Nothing is returned when every lookback date is before history starts
+        if values.empty:
+            raise ValueError(f"No history on or before lookback dates {np.ravel(lookback_dates).tolist()}")
+        ends = np.searchsorted(values.time.str[:10].to_numpy(), lookback_dates, side = 'right') - 1
+        # -1 would otherwise index from the latest row
+        if (ends < 0).any():
+            raise ValueError(f"No history on or before lookback dates {np.asarray(lookback_dates)[ends < 0].tolist()}")
+        return get_calibration_stats(pd.to_numeric(values.PriceUSD), pd.to_numeric(values.FeeMeanNtv), lookbacks, lookbacks, ends)
+
     # Returns current price, drift, standard error
     # Drift, SE calculated in log-space
     @staticmethod
     @lru_cache
     def get_historical_price_params(lookback: int = 100, lookback_date: str = date.today().strftime('%Y-%m-%d')):
-        values = pd.to_numeric(CMDataLoader.__get_network_data(end_time = lookback_date).PriceUSD.tail(lookback))
-        x = np.arange(values.size)
-        model = LinearRegression().fit(x.reshape((-1, 1)), np.log(values))
-
-        current_price, drift, se = (values.iloc[-1], model.coef_[0], (np.log(values) - model.intercept_ - (x * model.coef_)).std())
-        return (current_price, drift, se)
+        stats = CMDataLoader.get_historical_calibration_stats(lookback, lookback_date)
+        return (stats['current_price'].item(), stats['drift'].item(), stats['se'].item())
 
     # Returns (mean, sigma) over normal fee dist
     @staticmethod
     @lru_cache
     def get_historical_fee_params(lookback: int = 100, lookback_date: str = date.today().strftime('%Y-%m-%d')):
-        values = pd.to_numeric(CMDataLoader.__get_network_data(end_time = lookback_date).FeeMeanNtv.tail(lookback))
-        mean, sigma = (values.mean(), values.std())
-        return (mean, sigma)
+        stats = CMDataLoader.get_historical_calibration_stats(lookback, lookback_date)
+        return (stats['fee_mean'].item(), stats['fee_sigma'].item())
+
+    # Returns height of the next block to be mined after lookback_date (number of blocks mined so far)
+    @staticmethod
+    @lru_cache
+    def get_historical_block_height(lookback_date: str = date.today().strftime('%Y-%m-%d')):
+        return int(pd.to_numeric(CMDataLoader.__get_network_data(end_time = lookback_date).BlkCnt).sum())
@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+import requests
+
+from blockchain import get_cumulative_subsidy
+from constants import BLOCKS_PER_DAY
+
+
+DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'asset-metrics-btc.json')
+DEFAULT_UPSTREAM_URL = 'https://community-api.coinmetrics.io/v4'
+DEFAULT_METRICS = ['HashRate', 'IssTotUSD', 'FeeTotUSD', 'PriceUSD', 'FeeMeanNtv', 'BlkCnt']
+
+
+# Fetches all pages of daily btc asset-metrics from upstream and saves them as a fixture
+def record_fixture(fixture_path: str = DEFAULT_FIXTURE_PATH,
+                   metrics: list = DEFAULT_METRICS,
+                   upstream_url: str = DEFAULT_UPSTREAM_URL
+                   ):
+    api_str = f"{upstream_url}/timeseries/asset-metrics?assets=btc&metrics={','.join(metrics)}&page_size=10000&paging_from=start"
+    data = []
+    while api_str is not None:
+        response = requests.get(api_str)
+        response.raise_for_status()
+        response = response.json()
+        data += response['data']
+        api_str = response.get('next_page_url')
+    data = sorted(data, key = lambda row: row['time'])
+
+    os.makedirs(os.path.dirname(fixture_path), exist_ok = True)
+    with open(fixture_path, 'w') as f:
+        json.dump({'metrics': metrics, 'data': data}, f)
+    return len(data)
+
+
+# Rough start-of-year levels the synthetic fixture passes through, as (date, value)
+SYNTHETIC_HASH_RATE_ANCHORS = [('2009-01-03', 5e-6), ('2011-01-01', 0.1), ('2012-01-01', 10), ('2013-01-01', 25), ('2014-01-01', 1e4),
+                               ('2015-01-01', 3e5), ('2016-01-01', 8e5), ('2017-01-01', 2.5e6), ('2018-01-01', 1.5e7), ('2019-01-01', 4e7),
+                               ('2020-01-01', 1e8), ('2021-01-01', 1.5e8), ('2022-01-01', 1.8e8), ('2023-01-01', 2.5e8), ('2024-01-01', 5e8),
+                               ('2025-01-01', 8e8), ('2026-10-18', 1.08e9)]
+SYNTHETIC_PRICE_ANCHORS = [('2010-07-18', 0.08), ('2011-01-01', 0.3), ('2012-01-01', 5), ('2013-01-01', 13), ('2014-01-01', 800),
+                           ('2015-01-01', 300), ('2016-01-01', 430), ('2017-01-01', 1000), ('2018-01-01', 14000), ('2019-01-01', 3800),
+                           ('2020-01-01', 7200), ('2021-01-01', 29000), ('2022-01-01', 47000), ('2023-01-01', 16500), ('2024-01-01', 44000),
+                           ('2025-01-01', 94000), ('2026-10-18', 110000)]
+
+
+# Writes a deterministic synthetic fixture in the recorded format
+# Series interpolate log-linearly between rough historical anchors, with mean-reverting noise; subsidy follows the halving schedule
+# Like the real data, rows before price_start_date have no USD metrics
+def synthesize_fixture(fixture_path: str = DEFAULT_FIXTURE_PATH,
+                       start_date: str = '2009-01-03',
+                       price_start_date: str = '2010-07-18',
+                       end_date: str = '2026-10-18',
+                       seed: int = 1032009
+                       ):
+    rng = np.random.default_rng(seed)
+
+    # Log-linear path through anchors, with AR(1) noise so levels stay near them
+    def anchored_path(day_dates, anchors, sigma, persistence = 0.97):
+        anchor_days = [(date.fromisoformat(anchor_date) - day_dates[0]).days for (anchor_date, _) in anchors]
+        trend = np.interp(np.arange(len(day_dates)), anchor_days, np.log([value for (_, value) in anchors]))
+        noise = np.zeros(len(day_dates))
+        for i in range(1, len(day_dates)):
+            noise[i] = persistence * noise[i - 1] + rng.normal(0, sigma)
+        return np.exp(trend + noise)
+
+    dates = [date.fromisoformat(start_date) + timedelta(days = i)
+             for i in range((date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1)]
+    n_days = len(dates)
+    n_price_days = (date.fromisoformat(end_date) - date.fromisoformat(price_start_date)).days + 1
+
+    block_counts = rng.poisson(BLOCKS_PER_DAY, n_days)
+    block_heights = np.concatenate([[0], np.cumsum(block_counts)])
+    issuance_btc = get_cumulative_subsidy(block_heights[1:]) - get_cumulative_subsidy(block_heights[:-1])
+    # Daily hash rate estimates are noisy in proportion to the blocks found
+    hash_rates = anchored_path(dates, SYNTHETIC_HASH_RATE_ANCHORS, 0.01) * block_counts / BLOCKS_PER_DAY
+    fee_means_btc = 1e-4 * rng.lognormal(0, 0.4, n_days)
+    fees_btc = 0.05 * block_counts * rng.lognormal(0, 0.4, n_days)
+    prices = np.concatenate([np.full(n_days - n_price_days, np.nan), anchored_path(dates[n_days - n_price_days:], SYNTHETIC_PRICE_ANCHORS, 0.03)])
+
+    data = []
+    for i in range(n_days):
+        row = {'asset': 'btc', 'time': f"{dates[i].isoformat()}T00:00:00.000000000Z",
+               'HashRate': f"{hash_rates[i]:.8g}", 'FeeMeanNtv': f"{fee_means_btc[i]:.8g}", 'BlkCnt': str(block_counts[i])}
+        if not np.isnan(prices[i]):
+            row.update({'PriceUSD': f"{prices[i]:.8g}",
+                        'IssTotUSD': f"{issuance_btc[i] * prices[i]:.8g}",
+                        'FeeTotUSD': f"{fees_btc[i] * prices[i]:.8g}"})
+        data += [row]
+
+    os.makedirs(os.path.dirname(fixture_path), exist_ok = True)
+    with open(fixture_path, 'w') as f:
+        json.dump({'metrics': DEFAULT_METRICS, 'data': data}, f, separators = (',', ':'))
+    return len(data)
+
+
+# Serves /timeseries/asset-metrics from a recorded fixture
+# Supports metrics, end_time, page_size and paging_from, and paginates with next_page_token like the real API
+class CMStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith('/timeseries/asset-metrics'):
+            return self.__send_json(404, {'error': {'type': 'not_found', 'message': f"Unknown path {url.path}"}})
+
+        query = {key: values[-1] for (key, values) in parse_qs(url.query).items()}
+        metrics = query.get('metrics', ','.join(self.server.metrics)).split(',')
+        unknown_metrics = [metric for metric in metrics if metric not in self.server.metrics]
+        if unknown_metrics:
+            return self.__send_json(400, {'error': {'type': 'bad_parameter', 'message': f"Metrics not recorded: {','.join(unknown_metrics)}"}})
+
+        rows = self.server.data
+        if 'end_time' in query:
+            # end_time is inclusive; compare on the date prefix of time
+            rows = [row for row in rows if row['time'][:len(query['end_time'])] <= query['end_time']]
+
+        # Like the real API, pages run back from the latest rows unless paging_from=start
+        # Rows within a page are always oldest first
+        page_size = int(query.get('page_size', 100))
+        offset = int(query.get('next_page_token', 0))
+        if query.get('paging_from', 'end') == 'start':
+            page_rows = rows[offset:offset + page_size]
+        else:
+            page_rows = rows[max(len(rows) - offset - page_size, 0):len(rows) - offset]
+        page = [dict({'asset': row['asset'], 'time': row['time']}, **{metric: row[metric] for metric in metrics if metric in row})
+                for row in page_rows]
+
+        response = {'data': page}
+        if offset + page_size < len(rows):
+            query['next_page_token'] = str(offset + page_size)
+            response['next_page_token'] = query['next_page_token']
+            response['next_page_url'] = f"http://{self.headers['Host']}{url.path}?{urlencode(query)}"
+
+        time.sleep(self.server.latency)
+        self.__send_json(200, response)
+
+    def __send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+# Local stand-in for the Coin Metrics API
+# Set config.coinmetrics_api_url (or COINMETRICS_API_URL) to get_api_url() to route CMDataLoader here
+class CMStubServer():
+    def __init__(self,
+                 fixture_path: str = DEFAULT_FIXTURE_PATH,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 # Seconds added to every response, for deterministic latency
+                 latency: float = 0,
+                 verbose: bool = False
+                 ):
+        with open(fixture_path) as f:
+            fixture = json.load(f)
+
+        self.httpd = ThreadingHTTPServer((host, port), CMStubHandler)
+        self.httpd.metrics = fixture['metrics']
+        self.httpd.data = sorted(fixture['data'], key = lambda row: row['time'])
+        self.httpd.latency = latency
+        self.httpd.verbose = verbose
+        self.thread = None
+
+    def get_api_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v4"
+
+    # Serves in a background thread
+    def start(self):
+        self.thread = threading.Thread(target = self.httpd.serve_forever, daemon = True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+        self.thread = None
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Record, synthesize or replay Coin Metrics asset-metrics responses')
+    subparsers = parser.add_subparsers(dest = 'command', required = True)
+
+    record_parser = subparsers.add_parser('record', help = 'refresh the fixture from the Coin Metrics API')
+    record_parser.add_argument('--fixture', default = DEFAULT_FIXTURE_PATH)
+    record_parser.add_argument('--metrics', default = ','.join(DEFAULT_METRICS))
+    record_parser.add_argument('--upstream-url', default = DEFAULT_UPSTREAM_URL)
+
+    synthesize_parser = subparsers.add_parser('synthesize', help = 'write a deterministic synthetic fixture')
+    synthesize_parser.add_argument('--fixture', default = DEFAULT_FIXTURE_PATH)
+    synthesize_parser.add_argument('--end-date', default = '2026-10-18')
+    synthesize_parser.add_argument('--seed', type = int, default = 1032009)
+
+    serve_parser = subparsers.add_parser('serve', help = 'replay the fixture on a local port')
+    serve_parser.add_argument('--fixture', default = DEFAULT_FIXTURE_PATH)
+    serve_parser.add_argument('--host', default = '127.0.0.1')
+    serve_parser.add_argument('--port', type = int, default = 8000)
+    serve_parser.add_argument('--latency', type = float, default = 0)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        n_rows = record_fixture(args.fixture, args.metrics.split(','), args.upstream_url)
+        print(f"Recorded {n_rows} rows to {args.fixture}")
+    elif args.command == 'synthesize':
+        n_rows = synthesize_fixture(args.fixture, end_date = args.end_date, seed = args.seed)
+        print(f"Wrote {n_rows} synthetic rows to {args.fixture}")
+    else:
+        server = CMStubServer(args.fixture, args.host, args.port, args.latency, verbose = True)
+        print(f"Serving {args.fixture} at {server.get_api_url()}")
+        server.serve_forever()
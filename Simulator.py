@@ -5,7 +5,9 @@ import numpy as np
 from agents import *
 from generators import *
 from config import user_miner_specs
-from constants import Currency, Strategy
+from constants import Currency, Strategy, BLOCKS_PER_DAY
+from blockchain import DifficultyAdjuster, get_block_subsidies, get_daily_subsidies
+from strategies import score_strategies
 
 from CMDataLoader import CMDataLoader
 
@@ -15,9 +17,20 @@ def update_positions(miner, price, block_reward, global_hash_rate):
     return miner.update_positions(price, block_reward, global_hash_rate)
 
 
+# Picklable wrapper stepping miner through several days at a fixed global hash rate
+# Returns the miner and its hash rate at the end of each day
+def update_positions_span(miner, prices, block_rewards, global_hash_rate):
+    hash_rates = []
+    for (price, block_reward) in zip(prices, block_rewards):
+        hash_rates += [miner.update_positions(price, block_reward, global_hash_rate).get_hash_rate()]
+    return (miner, hash_rates)
+
+
 # Picklable wrapper for run_simulation on new instance
-def run_peer_simulation(env_miners, user_miners_long_btc, user_miners_sell_daily, prices, block_rewards, price_params, fee_params, block_subsidy):
-    sim = Simulator(env_miners, user_miners_long_btc, user_miners_sell_daily, prices, block_rewards, price_params, fee_params, block_subsidy)
+def run_peer_simulation(env_miners, user_miners_long_btc, user_miners_sell_daily, prices, block_rewards, price_params, fee_params, block_subsidy,
+                        start_block_height, difficulty_adjustment, step_days, parallel):
+    sim = Simulator(env_miners, user_miners_long_btc, user_miners_sell_daily, prices, block_rewards, price_params, fee_params, block_subsidy,
+                    start_block_height, difficulty_adjustment, step_days, parallel)
     return sim.run_simulation()
 
 
@@ -40,11 +53,26 @@ class Simulator():
                  # Parameters used for peer generation
                  price_params: tuple = CMDataLoader.get_historical_price_params(),
                  fee_params: tuple = CMDataLoader.get_historical_fee_params(),
-                 block_subsidy: float = 6.25
+                 # Constant subsidy per block; None follows the halving schedule
+                 block_subsidy: float = None,
+                 # Height of the first block mined in the simulation
+                 start_block_height: int = CMDataLoader.get_historical_block_height(),
+                 # Scale block production with hash rate, retargeting every 2016 blocks
+                 difficulty_adjustment: bool = True,
+                 # Step miners this many days at a time, e.g. DIFFICULTY_EPOCH // BLOCKS_PER_DAY to step by epoch
+                 # 1 is exact. Longer steps hold global hash rate (and so block production) fixed within each step,
+                 # so miners only react to each other's fleet changes at step boundaries
+                 # Daily hash rate output still sums each miner's fleet at the end of every day
+                 step_days: int = 1,
+                 # Step miners in a process pool; False steps them in this process
+                 # Use False when running many simulations from one pool, so processes aren't nested
+                 parallel: bool = True
                  ):
         self.miners = env_miners + user_miners_sell_daily + user_miners_long_btc
         self.prices = prices
-        self.block_rewards = block_rewards
+        # block_rewards assume the target block rate; realized rewards are filled in as the simulation runs
+        self.nominal_block_rewards = block_rewards
+        self.block_rewards = list(block_rewards)
 
         self.global_hash_rate = [self.get_day_global_hash_rate()]
 
@@ -54,10 +82,22 @@ class Simulator():
         self.user_long_btc_indexes = slice(len(self.miners) - len(user_miners_long_btc), len(self.miners))
         self.user_sell_daily_indexes = slice(-1 * (len(user_miners_long_btc) + len(user_miners_sell_daily)), -1 * len(user_miners_long_btc))
         self.env_indexes = slice(0, -1 * (len(user_miners_long_btc) + len(user_miners_sell_daily)))
+        self.user_indexes = slice(len(env_miners), len(self.miners))
+        # Env miner receiving machines of each (model, elec cost, strategy) bought by other miners
+        self.upgrade_indexes = dict()
+        for (i, miner) in enumerate(env_miners):
+            self.upgrade_indexes.setdefault((miner.machine_type.get_model(), miner.elec_cost, miner.strategy), i)
 
         self.price_params = price_params
         self.fee_params = fee_params
         self.block_subsidy = block_subsidy
+        self.start_block_height = start_block_height
+        self.difficulty_adjustment = difficulty_adjustment
+        self.step_days = step_days
+        self.parallel = parallel
+
+        self.difficulty_adjuster = DifficultyAdjuster(start_block_height, self.global_hash_rate[0])
+        self.block_heights = [start_block_height]
 
     def get_day_global_hash_rate(self):
         return sum([miner.get_hash_rate() for miner in self.miners])
@@ -92,12 +132,67 @@ class Simulator():
     def get_user_positions(self):
         return self.get_user_positions_long_btc().append(self.get_user_positions_sell_daily(), ignore_index = True)
 
+    # Daily USD profit of each user miner, one row per miner
+    def get_user_profits_usd(self):
+        return np.array([user_miner.get_daily_profits_usd() for user_miner in self.miners[self.user_indexes]])
+
+    # Scores strategy grids (see strategies.py) on each distinct user miner, across peers (or this run if there are none)
+    # User miners don't scale, so their profits don't depend on strategy and each path is simulated once
+    def score_user_strategies(self, strategy_grids: list):
+        runs = self.peers if len(self.peers) > 0 else [self]
+        prices = np.array([run.prices for run in runs])
+        profits_usd = np.array([run.get_user_profits_usd() for run in runs])
+
+        # Miners differing only in strategy have the same profits
+        user_miners = dict()
+        for (i, user_miner) in enumerate(self.miners[self.user_indexes]):
+            user_miners.setdefault((user_miner.machine_type.get_model(), user_miner.elec_cost, user_miner.n_machines), i)
+        scores = [score_strategies(strategy_grids, prices, profits_usd[:, i]).assign(machine_type = machine_type, elec_cost = elec_cost, n_machines = n_machines)
+                  for ((machine_type, elec_cost, n_machines), i) in user_miners.items()]
+        return pd.concat(scores, ignore_index = True)
+
+    # Rescale day i's fees to the blocks actually mined, and pay subsidy by block height
+    def __realize_block_rewards(self, i, nominal_subsidies):
+        if not self.difficulty_adjustment:
+            return self.block_rewards[i]
+        start_height, end_height = self.difficulty_adjuster.mine_day(self.global_hash_rate[-1])
+        self.block_heights += [end_height]
+        fees = (self.nominal_block_rewards[i] - nominal_subsidies[i]) * (end_height - start_height) / BLOCKS_PER_DAY
+        self.block_rewards[i] = fees + get_block_subsidies(start_height, end_height, self.block_subsidy)
+        return self.block_rewards[i]
+
+    # Hand machines of a newer model bought by each miner to that model's miner
+    def __deliver_upgrades(self):
+        for miner in self.miners:
+            for (model, n_machines) in miner.pop_upgrade_deliveries():
+                self.miners[self.upgrade_indexes[(model, miner.elec_cost, miner.strategy)]].add_machines(n_machines)
+
     # For running single trial
     def run_simulation(self):
-        pool = multiprocessing.Pool()
-        for i in range(1, len(self.prices)):
-            self.miners = pool.starmap(update_positions, [(miner, self.prices[i], self.block_rewards[i], self.global_hash_rate[-1]) for miner in self.miners])
-            self.global_hash_rate += [self.get_day_global_hash_rate()]
+        if not self.parallel:
+            return self.__run_steps(lambda update, args: [update(*arg) for arg in args])
+        with multiprocessing.Pool() as pool:
+            return self.__run_steps(pool.starmap)
+
+    # Steps miners through the simulation, mapping each step's updates with starmap
+    def __run_steps(self, starmap):
+        nominal_subsidies = get_daily_subsidies(self.start_block_height, len(self.block_rewards) - 1, self.block_subsidy)
+        i = 1
+        while i < len(self.prices):
+            n_days = min(self.step_days, len(self.prices) - i)
+            block_rewards = [self.__realize_block_rewards(j, nominal_subsidies) for j in range(i, i + n_days)]
+            if n_days == 1:
+                self.miners = starmap(update_positions, [(miner, self.prices[i], block_rewards[0], self.global_hash_rate[-1]) for miner in self.miners])
+                self.__deliver_upgrades()
+                self.global_hash_rate += [self.get_day_global_hash_rate()]
+            else:
+                miners, hash_rates = zip(*starmap(update_positions_span, [(miner, self.prices[i:i + n_days], block_rewards, self.global_hash_rate[-1]) for miner in self.miners]))
+                self.miners = list(miners)
+                self.global_hash_rate += list(np.sum(hash_rates, axis = 0))
+                # Machines handed to other miners land at the end of the step
+                self.__deliver_upgrades()
+                self.global_hash_rate[-1] = self.get_day_global_hash_rate()
+            i += n_days
         return self
 
     # For running multiple trials
@@ -109,8 +204,10 @@ class Simulator():
                  PriceGenerator(price_params = self.price_params).generate_prices(n_days = len(self.prices) - 1),
                  BlockRewardGenerator().generate_block_rewards(fee_params = self.fee_params,
                                                                block_subsidy = self.block_subsidy,
-                                                               n_days = len(self.block_rewards) - 1),
-                 self.price_params, self.fee_params, self.block_subsidy) for i in range(n_trials)]
+                                                               n_days = len(self.block_rewards) - 1,
+                                                               start_block_height = self.start_block_height),
+                 self.price_params, self.fee_params, self.block_subsidy,
+                 self.start_block_height, self.difficulty_adjustment, self.step_days, self.parallel) for i in range(n_trials)]
         self.peers = pool.starmap(run_peer_simulation, args)
         return self.peers
 
@@ -1,3 +1,5 @@
+from bisect import bisect_right
+from datetime import date
 from enum import Enum
 from functools import lru_cache
 import pandas as pd
@@ -44,6 +46,10 @@ class MachineInstance():
     def get_machine_price(self, btc_price_n, global_hash_rate_n):
         return self.machine_price_0 * (btc_price_n * self.global_hash_rate_0) / (self.btc_price_0 * global_hash_rate_n)
 
+    # Power efficiency, in J/TH (lower is better)
+    def get_efficiency(self):
+        return self.wattage / self.hash_rate
+
     def get_growth_factor(self):
         return self.growth_factor
 
@@ -55,7 +61,6 @@ class MachineInstance():
 
 
 # Catalog of machine types
-# TODO: Add more machines
 # TODO: Find more convincing growth factor estimation
 # TODO: Add dynamic machine prices
 class Machine(Enum):
@@ -65,19 +70,74 @@ class Machine(Enum):
     ANTMINER_S19 = MachineInstance(MachineName.ANTMINER_S19, 95, 3250)
     ANTMINER_T19 = MachineInstance(MachineName.ANTMINER_T19, 84, 3150)
     ANTMINER_S19_PRO = MachineInstance(MachineName.ANTMINER_S19_PRO, 110, 3250)
+    ANTMINER_S19_XP = MachineInstance(MachineName.ANTMINER_S19_XP, 140, 3010)
+    ANTMINER_S21 = MachineInstance(MachineName.ANTMINER_S21, 200, 3500)
 
     MICROBT_M20S = MachineInstance(MachineName.MICROBT_M20S, 68, 3360)
     MICROBT_M21S = MachineInstance(MachineName.MICROBT_M21S, 56, 3360)
     MICROBT_M30S = MachineInstance(MachineName.MICROBT_M30S, 86, 3268)
     MICROBT_M31S = MachineInstance(MachineName.MICROBT_M31S, 70, 3220)
+    MICROBT_M50S = MachineInstance(MachineName.MICROBT_M50S, 126, 3276)
+    MICROBT_M60S = MachineInstance(MachineName.MICROBT_M60S, 170, 3344)
 
     INNOSILICON_T2T = MachineInstance(MachineName.INNOSILICON_T2T, 24, 1980)
 
+    # Projected specs, continuing recent J/TH improvements
+    PROJECTED_GEN_2027 = MachineInstance(MachineName.PROJECTED_GEN_2027, 300, 3000)
+    PROJECTED_GEN_2028 = MachineInstance(MachineName.PROJECTED_GEN_2028, 400, 3200)
+
     @classmethod
     def from_model(cls, model: str):
         return [m for m in cls if m.value.get_model() == model][0]
 
 
+# Release and retirement schedule of machine models, by simulated day
+# Built from calendar dates, counting days from start_date (simulated day 0)
+# Lookups are precomputed so the daily step doesn't create any objects
+class MachineSchedule():
+    def __init__(self,
+                 release_dates: dict = config.machine_release_dates,
+                 retirement_dates: dict = config.machine_retirement_dates,
+                 start_date: str = date.today().strftime('%Y-%m-%d')
+                 ):
+        def get_day(date_str):
+            return (date.fromisoformat(date_str) - date.fromisoformat(start_date)).days
+
+        # Models without a release date count as released before all others
+        release_days = {machine_name: get_day(release_date) for (machine_name, release_date) in release_dates.items()}
+        # Sort by release day; on ties, the most efficient model counts as newest
+        machines = sorted([machine.value for machine in Machine],
+                          key = lambda m: (release_days.get(MachineName(m.get_model()), float('-inf')), -m.get_efficiency()))
+        self.machines = machines
+        self.release_days = [release_days.get(MachineName(m.get_model()), float('-inf')) for m in machines]
+        self.retirement_days = {m.get_model(): get_day(retirement_dates[MachineName(m.get_model())]) if MachineName(m.get_model()) in retirement_dates else None
+                                for m in machines}
+
+    def get_retirement_day(self, machine_type: MachineInstance):
+        return self.retirement_days[machine_type.get_model()]
+
+    def is_retired(self, machine_type: MachineInstance, day: int):
+        retirement_day = self.get_retirement_day(machine_type)
+        return retirement_day is not None and retirement_day <= day
+
+    # Newest model released and not yet retired on given day
+    def get_newest_machine(self, day: int):
+        for i in reversed(range(bisect_right(self.release_days, day))):
+            if not self.is_retired(self.machines[i], day):
+                return self.machines[i]
+        return None
+
+    # Every model that is the newest on some day from day 0, oldest first
+    def get_newest_machines(self):
+        change_days = [0] + [day for day in self.release_days + list(self.retirement_days.values()) if day is not None and day > 0]
+        newest_machines = dict()
+        for day in sorted(set(change_days)):
+            machine = self.get_newest_machine(day)
+            if machine is not None:
+                newest_machines.setdefault(machine.get_model(), machine)
+        return list(newest_machines.values())
+
+
 # Miner equivalence class: aggregate all miners of same machine type, strategy, electricity cost
 class Miner():
     def __init__(self,
@@ -88,7 +148,10 @@ class Miner():
                  n_machines: int = 1000,
                  historical_global_mining_rev_usd: pd.Series = CMDataLoader.get_historical_miner_revenue_usd(),
                  historical_hash_rate: pd.Series = CMDataLoader.get_historical_hash_rate(),
-                 is_scalable: bool = True
+                 is_scalable: bool = True,
+                 # If set, scale-ups buy the newest model and retired machines are traded in for it
+                 # Newest-model machines bought by other models' miners are handed off by Simulator (see add_machines)
+                 machine_schedule: MachineSchedule = None
                  ):
         self.machine_type = machine_type.value
         self.strategy = strategy
@@ -98,17 +161,25 @@ class Miner():
 
         # User's miner is the only one that isn't scalable
         self.is_scalable = is_scalable
+        self.machine_schedule = machine_schedule
 
         # Seed historical pnl
         self.pnl_usd = list(self.__calc_pnl_usd(historical_global_mining_rev_usd, historical_hash_rate))
 
-        self.position_changes = pd.DataFrame({Currency.BTC.value: [0], Currency.USD.value: [0]})
+        # Daily position changes, collected into a DataFrame on demand
+        self.position_changes = [{Currency.BTC.value: 0, Currency.USD.value: 0}]
 
         self.days_active = 0
         # Stores days_active: delivered machines
         self.pending_setups = dict()
+        # Stores days_active: {model: machines} for orders of a newer model, delivered to that model's miner
+        self.pending_upgrades = dict()
+        # (model, machines) delivered from pending_upgrades and not yet handed off
+        self.upgrade_deliveries = []
         # Number of machines currently pending
         self.pending_count = 0
+        # (delivery day, new machine type, machines ordered, machines traded in) while replacing a retired model
+        self.migration = None
 
     # Used to scale operation before simulation starts to line up with current hashrate
     def scale_operation_scalar(self, scalar):
@@ -138,61 +209,114 @@ class Miner():
         if self.days_active in self.pending_setups:
             self.n_machines += self.pending_setups[self.days_active]
             self.pending_count -= self.pending_setups[self.days_active]
+        if self.days_active in self.pending_upgrades:
+            for (model, machine_addition) in self.pending_upgrades.pop(self.days_active).items():
+                self.upgrade_deliveries += [(model, machine_addition)]
+                self.pending_count -= machine_addition
+
+    # Model bought when scaling up: the newest available, if there's a schedule
+    def __get_order_machine_type(self):
+        if self.machine_schedule is None:
+            return self.machine_type
+        return self.machine_schedule.get_newest_machine(self.days_active) or self.machine_type
 
     # Place orders to scale up operation (subject setup time delay)
+    # Orders of a newer model than this miner's are delivered to that model's miner
     def __scale_up_operation(self, pnl_lagged, price_btc_usd, global_hash_rate):
-        machine_addition_raw = self.machine_type.get_growth_factor() * (pnl_lagged - self.__calc_expense_usd()) // self.machine_type.get_machine_price(price_btc_usd, global_hash_rate)
+        order_machine_type = self.__get_order_machine_type()
+        machine_addition_raw = self.machine_type.get_growth_factor() * (pnl_lagged - self.__calc_expense_usd()) // order_machine_type.get_machine_price(price_btc_usd, global_hash_rate)
         machine_addition = max(abs(machine_addition_raw) - self.pending_count, 0)
 
-        pending_setup_day = self.days_active + self.machine_type.get_setup_time()
-        self.pending_setups[pending_setup_day] = machine_addition
+        pending_setup_day = self.days_active + order_machine_type.get_setup_time()
+        if order_machine_type.get_model() == self.machine_type.get_model():
+            self.pending_setups[pending_setup_day] = machine_addition
+        elif machine_addition > 0:
+            upgrades = self.pending_upgrades.setdefault(pending_setup_day, dict())
+            upgrades[order_machine_type.get_model()] = upgrades.get(order_machine_type.get_model(), 0) + machine_addition
         self.pending_count += machine_addition
 
+    # Order the newest model available to replace retired machines (and pending orders of the retired model)
+    # Trade-ins recover config.machine_salvage_factor of the retired model's current price
+    # Retired machines keep hashing until the replacement is delivered
+    def __migrate_operation(self, price_btc_usd, global_hash_rate):
+        if self.migration is not None:
+            self.__complete_migration()
+            return
+        if self.machine_schedule is None or not self.machine_schedule.is_retired(self.machine_type, self.days_active):
+            return
+        new_machine_type = self.machine_schedule.get_newest_machine(self.days_active)
+        if new_machine_type is None or new_machine_type.get_model() == self.machine_type.get_model():
+            return
+        upgrade_count = sum([sum(upgrades.values()) for upgrades in self.pending_upgrades.values()])
+        capital_usd = config.machine_salvage_factor * (self.n_machines + self.pending_count - upgrade_count) * self.machine_type.get_machine_price(price_btc_usd, global_hash_rate)
+        machine_addition = capital_usd // new_machine_type.get_machine_price(price_btc_usd, global_hash_rate)
+
+        self.pending_setups = dict()
+        self.pending_count = upgrade_count
+        self.migration = (self.days_active + new_machine_type.get_setup_time(), new_machine_type, machine_addition, self.n_machines)
+
+    # Swap retired machines for their replacements once delivered
+    # Machines scaled down while waiting forfeit their share of the replacement
+    def __complete_migration(self):
+        delivery_day, new_machine_type, machine_addition, n_machines_traded = self.migration
+        if self.days_active < delivery_day:
+            return
+        self.machine_type = new_machine_type
+        self.n_machines = machine_addition * self.n_machines // n_machines_traded if n_machines_traded > 0 else machine_addition
+        self.migration = None
+
     # Scales miner operations according to scaling formula
+    # No retired machines are bought while a migration is pending
     def __scale_operation(self, price_btc_usd, global_hash_rate):
         self.__scale_up_pending()
         if len(self.pnl_usd) >= self.lag:
             pnl_lagged = sum(self.pnl_usd[-self.lag:])
             if pnl_lagged < 0 and self.n_machines > 0:
                 self.__scale_down_operation(pnl_lagged)
-            elif pnl_lagged > self.__calc_expense_usd():
+            elif pnl_lagged > self.__calc_expense_usd() and self.migration is None:
                 self.__scale_up_operation(pnl_lagged, price_btc_usd, global_hash_rate)
 
-    @staticmethod
-    def __calc_sell_daily_position_change(usd_profit, price_btc_usd):
-        return {Currency.BTC.value: 0, Currency.USD.value: usd_profit}
-
-    @staticmethod
-    def __calc_long_btc_position_change(usd_profit, price_btc_usd):
-        return {Currency.BTC.value: usd_profit / price_btc_usd, Currency.USD.value: 0}
-
     def __calc_position_changes(self, price_btc_usd, global_mining_rev_btc, global_hash_rate):
         usd_profit = self.__calc_usd_profit(price_btc_usd * global_mining_rev_btc, global_hash_rate)
         if self.is_scalable:
+            self.__migrate_operation(price_btc_usd, global_hash_rate)
             self.__scale_operation(price_btc_usd, global_hash_rate)
-        if self.strategy == Strategy.SELL_DAILY:
-            return self.__calc_sell_daily_position_change(usd_profit, price_btc_usd)
-        # If LONG_BTC
-        return self.__calc_long_btc_position_change(usd_profit, price_btc_usd)
+        sell_fraction = STRATEGY_SELL_FRACTIONS[self.strategy]
+        return {Currency.BTC.value: (1 - sell_fraction) * usd_profit / price_btc_usd, Currency.USD.value: sell_fraction * usd_profit}
 
     def update_positions(self, price_btc_usd, global_mining_rev_btc, global_hash_rate):
         daily_position_changes = self.__calc_position_changes(price_btc_usd, global_mining_rev_btc, global_hash_rate)
         self.days_active += 1
 
-        self.position_changes = self.position_changes.append({
-                                                              Currency.BTC.value: daily_position_changes[Currency.BTC.value],
-                                                              Currency.USD.value: daily_position_changes[Currency.USD.value]
-                                                              }, ignore_index = True)
+        self.position_changes += [{
+                                   Currency.BTC.value: daily_position_changes[Currency.BTC.value],
+                                   Currency.USD.value: daily_position_changes[Currency.USD.value]
+                                   }]
         return self
 
     def get_hash_rate(self):
         return self.machine_type.get_hash_rate() * self.n_machines
 
+    # Adds machines bought by another miner (see pop_upgrade_deliveries)
+    def add_machines(self, n_machines):
+        self.n_machines += n_machines
+
+    # Returns and clears newer-model machines delivered since the last call, as (model, machines)
+    def pop_upgrade_deliveries(self):
+        upgrade_deliveries = self.upgrade_deliveries
+        if upgrade_deliveries:
+            self.upgrade_deliveries = []
+        return upgrade_deliveries
+
     def get_elec_cost(self):
         return self.elec_cost
 
     def get_positions(self):
-        return self.position_changes.cumsum()
+        return pd.DataFrame(self.position_changes).cumsum()
+
+    # Daily USD profit since the simulation started, with 0 on day 0
+    def get_daily_profits_usd(self):
+        return [0] + self.pnl_usd[len(self.pnl_usd) - self.days_active:]
 
     def __repr__(self):
         return f"Miner({self.machine_type}, {self.strategy}, {self.n_machines}, {self.elec_cost})"
@@ -0,0 +1,69 @@
+import numpy as np
+
+from constants import *
+
+
+# Total subsidy (BTC) paid out by blocks [0, block_height)
+# Closed form over halving eras, so it works on whole arrays of (fractional) heights
+def get_cumulative_subsidy(block_heights):
+    block_heights = np.asarray(block_heights, dtype = float)
+    halvings = np.floor(block_heights / HALVING_INTERVAL)
+    completed_eras = HALVING_INTERVAL * INITIAL_BLOCK_SUBSIDY * (2 - np.power(2.0, 1 - halvings))
+    current_era = (block_heights - halvings * HALVING_INTERVAL) * INITIAL_BLOCK_SUBSIDY / np.power(2.0, halvings)
+    return completed_eras + current_era
+
+
+# Total subsidy paid out by blocks [start_heights, end_heights)
+# A constant block_subsidy overrides the halving schedule
+def get_block_subsidies(start_heights, end_heights, block_subsidy: float = None):
+    if block_subsidy is not None:
+        return block_subsidy * (np.asarray(end_heights, dtype = float) - np.asarray(start_heights, dtype = float))
+    return get_cumulative_subsidy(end_heights) - get_cumulative_subsidy(start_heights)
+
+
+# Daily subsidy for days 0..n_days at the target block rate
+# Day 0 is the last full day before start_block_height
+def get_daily_subsidies(start_block_height: int, n_days: int = 100, block_subsidy: float = None):
+    start_heights = start_block_height + (np.arange(n_days + 1) - 1) * BLOCKS_PER_DAY
+    return get_block_subsidies(start_heights, start_heights + BLOCKS_PER_DAY, block_subsidy)
+
+
+# Tracks block height and difficulty as the network hash rate changes
+# Difficulty is expressed as the hash rate at which blocks arrive on target
+class DifficultyAdjuster():
+    def __init__(self,
+                 # Height of the next block to be mined, i.e. blocks mined so far
+                 start_block_height: int,
+                 start_hash_rate: float
+                 ):
+        self.block_height = start_block_height
+        self.difficulty_hash_rate = start_hash_rate
+        # Assume the current epoch has been mined on target so far
+        self.epoch_blocks = start_block_height % DIFFICULTY_EPOCH
+        self.epoch_days = self.epoch_blocks / BLOCKS_PER_DAY
+
+    # Retarget so the last epoch would have taken two weeks, within protocol bounds
+    def __adjust_difficulty(self):
+        target_days = DIFFICULTY_EPOCH / BLOCKS_PER_DAY
+        adjustment = min(max(target_days / self.epoch_days, 1 / MAX_DIFFICULTY_ADJUSTMENT), MAX_DIFFICULTY_ADJUSTMENT)
+        self.difficulty_hash_rate *= adjustment
+        self.epoch_blocks = 0
+        self.epoch_days = 0
+
+    # Mines one day at the given hash rate, retargeting at epoch boundaries
+    # Returns (start, end) block heights of the day
+    def mine_day(self, hash_rate: float):
+        start_block_height = self.block_height
+        days_left = 1.0
+        while days_left > 0 and hash_rate > 0:
+            blocks_per_day = BLOCKS_PER_DAY * hash_rate / self.difficulty_hash_rate
+            days_to_retarget = (DIFFICULTY_EPOCH - self.epoch_blocks) / blocks_per_day
+            days_mined = min(days_left, days_to_retarget)
+
+            self.block_height += blocks_per_day * days_mined
+            self.epoch_blocks += blocks_per_day * days_mined
+            self.epoch_days += days_mined
+            days_left -= days_mined
+            if days_mined == days_to_retarget:
+                self.__adjust_difficulty()
+        return (start_block_height, self.block_height)
@@ -1,3 +1,6 @@
+import os
+from datetime import date
+
 from constants import MachineName, Strategy
 
 user_miner_specs = {
@@ -45,13 +48,20 @@ machine_prices = {
     MachineName.ANTMINER_S19: 6019.00,
     MachineName.ANTMINER_T19: 4922.00,
     MachineName.ANTMINER_S19_PRO: 7388.00,
+    MachineName.ANTMINER_S19_XP: 9_800.00,
+    MachineName.ANTMINER_S21: 13_000.00,
 
     MachineName.MICROBT_M20S: 5_674.27,
     MachineName.MICROBT_M21S: 4_231.81,
     MachineName.MICROBT_M30S: 9_989.33,
     MachineName.MICROBT_M31S: 8_385.29,
+    MachineName.MICROBT_M50S: 8_500.00,
+    MachineName.MICROBT_M60S: 11_000.00,
+
+    MachineName.INNOSILICON_T2T: 1_394.50,
 
-    MachineName.INNOSILICON_T2T: 1_394.50
+    MachineName.PROJECTED_GEN_2027: 15_000.00,
+    MachineName.PROJECTED_GEN_2028: 18_000.00
 }
 
 machine_growth_factors = {
@@ -61,13 +71,20 @@ machine_growth_factors = {
     MachineName.ANTMINER_S19: 1,
     MachineName.ANTMINER_T19: 0.8,
     MachineName.ANTMINER_S19_PRO: 1,
+    MachineName.ANTMINER_S19_XP: 1,
+    MachineName.ANTMINER_S21: 1,
 
     MachineName.MICROBT_M20S: 0.5,
     MachineName.MICROBT_M21S: 0.5,
     MachineName.MICROBT_M30S: 0.8,
     MachineName.MICROBT_M31S: 0.8,
+    MachineName.MICROBT_M50S: 0.8,
+    MachineName.MICROBT_M60S: 0.8,
 
-    MachineName.INNOSILICON_T2T: 0.4
+    MachineName.INNOSILICON_T2T: 0.4,
+
+    MachineName.PROJECTED_GEN_2027: 1,
+    MachineName.PROJECTED_GEN_2028: 1
 }
 
 machine_setup_times = {
@@ -77,17 +94,73 @@ machine_setup_times = {
     MachineName.ANTMINER_S19: 48,
     MachineName.ANTMINER_T19: 48,
     MachineName.ANTMINER_S19_PRO: 48,
+    MachineName.ANTMINER_S19_XP: 48,
+    MachineName.ANTMINER_S21: 48,
 
     MachineName.MICROBT_M20S: 21,
     MachineName.MICROBT_M21S: 21,
     MachineName.MICROBT_M30S: 36,
     MachineName.MICROBT_M31S: 36,
+    MachineName.MICROBT_M50S: 36,
+    MachineName.MICROBT_M60S: 36,
+
+    MachineName.INNOSILICON_T2T: 14,
 
-    MachineName.INNOSILICON_T2T: 14
+    MachineName.PROJECTED_GEN_2027: 48,
+    MachineName.PROJECTED_GEN_2028: 48
 }
 
+# Machine release schedule
+# Date each model started shipping (approximate); projected generations are placeholders for future releases
+# Schedules count days from the simulation start, so models released before it are available from day 0
+machine_release_dates = {
+    MachineName.ANTMINER_S9: '2016-06-01',
+    MachineName.ANTMINER_S17: '2019-04-01',
+    MachineName.ANTMINER_T17: '2019-05-01',
+    MachineName.ANTMINER_S19: '2020-05-01',
+    MachineName.ANTMINER_T19: '2020-05-01',
+    MachineName.ANTMINER_S19_PRO: '2020-05-01',
+    MachineName.ANTMINER_S19_XP: '2022-07-01',
+    MachineName.ANTMINER_S21: '2024-01-01',
+
+    MachineName.MICROBT_M20S: '2019-06-01',
+    MachineName.MICROBT_M21S: '2019-06-01',
+    MachineName.MICROBT_M30S: '2020-04-01',
+    MachineName.MICROBT_M31S: '2020-04-01',
+    MachineName.MICROBT_M50S: '2022-12-01',
+    MachineName.MICROBT_M60S: '2024-01-01',
+
+    MachineName.INNOSILICON_T2T: '2018-11-01',
+
+    MachineName.PROJECTED_GEN_2027: '2027-07-01',
+    MachineName.PROJECTED_GEN_2028: '2028-07-01'
+}
+
+# Date each model is retired
+# Environment miners trade retired machines in for the newest model available
+# Models not listed are never retired
+machine_retirement_dates = {
+    MachineName.ANTMINER_S9: '2027-10-01',
+    MachineName.ANTMINER_S17: '2028-10-01',
+    MachineName.ANTMINER_T17: '2028-10-01',
+
+    MachineName.INNOSILICON_T2T: '2027-10-01'
+}
+
+# Fraction of a retired machine's current price recovered when trading it in
+# Retired models resell far below new-model pricing, so most of their capital is lost
+machine_salvage_factor = 0.25
+
+# Prices of machines released by today (default user catalog)
+launch_machine_prices = {machine_name: machine_price for (machine_name, machine_price) in machine_prices.items()
+                         if machine_release_dates.get(machine_name, '') <= date.today().strftime('%Y-%m-%d')}
+
 # Distribution of strategies
 strategy_props = {
     Strategy.SELL_DAILY: 0.5,
     Strategy.LONG_BTC: 0.5
 }
+
+# Coin Metrics API base URL
+# Point at a local CMStubServer (see CMStubServer.py) to run offline
+coinmetrics_api_url = os.environ.get('COINMETRICS_API_URL', 'https://community-api.coinmetrics.io/v4')
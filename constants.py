@@ -2,7 +2,6 @@ from enum import Enum
 
 
 # String values for machine names
-# TODO: Add more machines
 class MachineName(Enum):
     ANTMINER_S9 = 'Antminer S9'
     ANTMINER_S17 = 'Antminer S17'
@@ -10,14 +9,22 @@ class MachineName(Enum):
     ANTMINER_S19 = 'Antminer S19'
     ANTMINER_T19 = 'Antminer T19'
     ANTMINER_S19_PRO = 'Antminer S19 Pro'
+    ANTMINER_S19_XP = 'Antminer S19 XP'
+    ANTMINER_S21 = 'Antminer S21'
 
     MICROBT_M20S = 'MicroBT M20s'
     MICROBT_M21S = 'MicroBT M21s'
     MICROBT_M30S = 'MicroBT M30s'
     MICROBT_M31S = 'MicroBT M31s'
+    MICROBT_M50S = 'MicroBT M50s'
+    MICROBT_M60S = 'MicroBT M60s'
 
     INNOSILICON_T2T = 'Innosilicon T2T'
 
+    # Placeholder future generations, with projected specs
+    PROJECTED_GEN_2027 = 'Projected 2027 Gen'
+    PROJECTED_GEN_2028 = 'Projected 2028 Gen'
+
 
 # Catalog of strategies
 class Strategy(Enum):
@@ -25,7 +32,23 @@ class Strategy(Enum):
     LONG_BTC = "Long BTC"
 
 
+# Fraction of each day's profit sold for USD, by strategy
+# The rest is held as BTC
+STRATEGY_SELL_FRACTIONS = {
+    Strategy.SELL_DAILY: 1,
+    Strategy.LONG_BTC: 0
+}
+
+
 # Enum for currencies
 class Currency(Enum):
     BTC = 'BTC'
     USD = 'USD'
+
+
+# Bitcoin protocol parameters
+INITIAL_BLOCK_SUBSIDY = 50 # BTC
+HALVING_INTERVAL = 210_000 # blocks
+DIFFICULTY_EPOCH = 2016 # blocks between difficulty adjustments
+BLOCKS_PER_DAY = 6 * 24 # at target block time of 10 minutes
+MAX_DIFFICULTY_ADJUSTMENT = 4 # max factor difficulty can move per epoch
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+# Cumulative sums with a leading 0, so window sums are differences of two entries
+# Non-finite values (NaN, or -inf from log of 0) count as 0 in the sums and are tracked as missing
+def get_cumulative_sums(values):
+    values = np.asarray(values, dtype = float)
+    is_missing = ~np.isfinite(values)
+    # Centering keeps the sums of squares well conditioned
+    center = values[~is_missing].mean() if (~is_missing).any() else 0
+    values = np.where(is_missing, 0, values - center)
+    index = np.arange(values.size)
+
+    def cumsum(x):
+        return np.concatenate([[0], np.cumsum(x)])
+
+    return {
+        'center': center,
+        'missing': cumsum(is_missing),
+        'y': cumsum(values),
+        'yy': cumsum(values * values),
+        'ty': cumsum(index * values),
+    }
+
+
+# Window bounds [starts, ends] for each (lookback, end) pair, broadcast together
+# Windows are clipped at the start of the series, like DataFrame.tail
+def get_windows(lookbacks, ends):
+    lookbacks, ends = np.broadcast_arrays(np.asarray(lookbacks), np.asarray(ends))
+    starts = np.maximum(ends - lookbacks + 1, 0)
+    return (starts, ends)
+
+
+# Mean and sigma (ddof 1) of values over each window, skipping missing values like pandas
+def get_window_mean_std(cumulative_sums, starts, ends):
+    n = ends - starts + 1 - (cumulative_sums['missing'][ends + 1] - cumulative_sums['missing'][starts])
+    sum_y = cumulative_sums['y'][ends + 1] - cumulative_sums['y'][starts]
+    sum_yy = cumulative_sums['yy'][ends + 1] - cumulative_sums['yy'][starts]
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean = sum_y / n
+        var = (sum_yy - n * mean * mean) / (n - 1)
+    return (mean + cumulative_sums['center'], np.sqrt(np.maximum(var, 0)))
+
+
+# Least-squares fit of values on day index (0 at window start) over each window
+# Windows containing missing values give NaN
+# Returns (intercept, slope, residual standard error with ddof 1)
+def get_window_trend(cumulative_sums, starts, ends):
+    n = ends - starts + 1
+    sum_x = n * (n - 1) / 2
+    sum_xx = (n - 1) * n * (2 * n - 1) / 6
+    sum_y = cumulative_sums['y'][ends + 1] - cumulative_sums['y'][starts]
+    sum_yy = cumulative_sums['yy'][ends + 1] - cumulative_sums['yy'][starts]
+    sum_xy = cumulative_sums['ty'][ends + 1] - cumulative_sums['ty'][starts] - starts * sum_y
+    has_missing = cumulative_sums['missing'][ends + 1] > cumulative_sums['missing'][starts]
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        slope = (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+        intercept = (sum_y - slope * sum_x) / n
+        sse = sum_yy - intercept * sum_y - slope * sum_xy
+        se = np.sqrt(np.maximum(sse, 0) / (n - 1))
+    intercept = np.where(has_missing, np.nan, intercept + cumulative_sums['center'])
+    slope = np.where(has_missing, np.nan, slope)
+    se = np.where(has_missing, np.nan, se)
+    return (intercept, slope, se)
+
+
+# Calibration stats for each (lookback, end) pair, from one pass over each series
+# Price drift and SE are fit in log-space; fee mean and sigma are over raw values
+# Returns dict of arrays shaped like the broadcast of lookbacks and ends
+def get_calibration_stats(prices,
+                          fees,
+                          price_lookbacks = 100,
+                          fee_lookbacks = 100,
+                          ends = -1
+                          ):
+    prices = np.asarray(prices, dtype = float)
+    fees = np.asarray(fees, dtype = float)
+    ends = np.where(np.asarray(ends) < 0, prices.size + np.asarray(ends), ends)
+
+    price_starts, price_ends = get_windows(price_lookbacks, ends)
+    fee_starts, fee_ends = get_windows(fee_lookbacks, ends)
+    # Zero prices give -inf, which get_cumulative_sums treats as missing
+    with np.errstate(divide = 'ignore'):
+        log_prices = np.log(prices)
+    intercept, drift, se = get_window_trend(get_cumulative_sums(log_prices), price_starts, price_ends)
+    fee_mean, fee_sigma = get_window_mean_std(get_cumulative_sums(fees), fee_starts, fee_ends)
+
+    return {
+        'current_price': prices[price_ends],
+        'intercept': intercept,
+        'drift': drift,
+        'se': se,
+        'fee_mean': fee_mean,
+        'fee_sigma': fee_sigma,
+    }
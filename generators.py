@@ -3,6 +3,7 @@ import numpy as np
 import config
 from agents import *
 from constants import *
+from blockchain import get_daily_subsidies
 from CMDataLoader import CMDataLoader
 
 
@@ -23,18 +24,21 @@ class PriceGenerator():
         return list(prices)
 
 
-# Generates BTC-denominated daily block rewards
-# Uses lognormal distribution
+# Generates BTC-denominated daily block rewards, at the target block rate
+# Uses lognormal distribution for fees
 class BlockRewardGenerator():
     # Mean, sigma are mean and sigma of normal distribution, not log-normal distribution
     # This is compatible with both numpy and how we break down the data
+    # Subsidy follows the halving schedule from start_block_height, unless a constant block_subsidy is given
     def generate_block_rewards(self,
                                fee_params: tuple = CMDataLoader.get_historical_fee_params(),
-                               block_subsidy: float = 6.25,
-                               n_days: int = 100
+                               block_subsidy: float = None,
+                               n_days: int = 100,
+                               start_block_height: int = CMDataLoader.get_historical_block_height()
                                ):
         fee_mean, fee_sigma = fee_params
-        return list((block_subsidy + np.random.lognormal(fee_mean, fee_sigma, n_days + 1)) * 6 * 24)
+        fees = np.random.lognormal(fee_mean, fee_sigma, n_days + 1) * BLOCKS_PER_DAY
+        return list(get_daily_subsidies(start_block_height, n_days, block_subsidy) + fees)
 
 
 # Generates distribution of miners
@@ -44,17 +48,28 @@ class MinerGenerator():
                  # Dict mapping electricity price to proportion
                  elec_cost_props: dict = config.elec_cost_props,
                  # Dict mapping strategy to proportion
-                 strategy_props: dict = config.strategy_props
+                 strategy_props: dict = config.strategy_props,
+                 # Release/retirement schedule used to buy and migrate to newer models; None keeps every miner on its model
+                 machine_schedule: MachineSchedule = MachineSchedule(),
+                 # History used to seed miners' lagged pnl
+                 historical_global_mining_rev_usd: pd.Series = CMDataLoader.get_historical_miner_revenue_usd(),
+                 historical_hash_rate: pd.Series = CMDataLoader.get_historical_hash_rate()
                  ):
         self.lag = lag
         self.elec_cost_props = elec_cost_props
         self.strategy_props = strategy_props
+        self.machine_schedule = machine_schedule
+        self.historical_global_mining_rev_usd = historical_global_mining_rev_usd
+        self.historical_hash_rate = historical_hash_rate
 
     def __generate_miner_elec_distribution(self,
                                            machine_type: MachineInstance = Machine.MICROBT_M31S,
                                            strategy: str = Strategy.SELL_DAILY,
                                            n_machines_total: int = 100):
-        return [Miner(machine_type, strategy, self.lag, elec_cost, n_machines_total * self.elec_cost_props[elec_cost] * self.strategy_props[strategy])
+        return [Miner(machine_type, strategy, self.lag, elec_cost, n_machines_total * self.elec_cost_props[elec_cost] * self.strategy_props[strategy],
+                      historical_global_mining_rev_usd = self.historical_global_mining_rev_usd,
+                      historical_hash_rate = self.historical_hash_rate,
+                      machine_schedule = self.machine_schedule)
                 for elec_cost in self.elec_cost_props]
 
     def __generate_miner_distribution_unscaled(self,
@@ -62,7 +77,7 @@ class MinerGenerator():
                                                machine_counts: dict
                                                ):
         miners_nested = [self.__generate_miner_elec_distribution(Machine.from_model(machine_name.value), strategy, machine_counts[machine_name])
-                         for machine_name in MachineName
+                         for machine_name in machine_counts
                          for strategy in Strategy]
         miners = [miner for miner_tranche in miners_nested for miner in miner_tranche]
         return miners
@@ -81,6 +96,11 @@ class MinerGenerator():
                                     machine_counts_unscaled: dict = config.machine_counts,
                                     starting_hashrate: float = CMDataLoader.get_historical_hash_rate().dropna().iloc[-1]
                                     ):
+        # Models that become the newest start with no machines, and grow from scale-ups bought by other miners
+        if self.machine_schedule is not None:
+            upgrade_counts = {MachineName(machine.get_model()): 0 for machine in self.machine_schedule.get_newest_machines()
+                              if MachineName(machine.get_model()) not in machine_counts_unscaled}
+            machine_counts_unscaled = {**machine_counts_unscaled, **upgrade_counts}
         miners_unscaled = self.__generate_miner_distribution_unscaled(machine_counts_unscaled)
         miners = self.__scale_miner_distribution(miners_unscaled, starting_hashrate)
         return miners
@@ -89,7 +109,7 @@ class MinerGenerator():
 class UserMinerGenerator():
     @staticmethod
     def generate_user_miners(budget: int = 1_000_000,
-                             machine_prices: dict = config.machine_prices,
+                             machine_prices: dict = config.launch_machine_prices,
                              elec_costs: list = [0.04, 0.07]
                              ):
         user_miners_long_btc = [Miner(machine_type = Machine.from_model(machine_type.value),
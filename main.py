@@ -60,7 +60,7 @@ def get_user_plots(user_positions, n_trials, title_suffix, elec_cost, palette):
     return (long_btc_fig, sell_daily_fig)
 
 
-def get_summary_plots(price_params, fee_params, block_subsidy, n_trials, title_suffix, file_suffix, user_machine_prices = config.machine_prices, elec_costs = [0.04, 0.07], palette = my_palette):
+def get_summary_plots(price_params, fee_params, block_subsidy, n_trials, title_suffix, file_suffix, user_machine_prices = config.launch_machine_prices, elec_costs = [0.04, 0.07], palette = my_palette):
     init_prices = PriceGenerator(price_params).generate_prices()
     user_miners_long_btc, user_miners_sell_daily = UserMinerGenerator().generate_user_miners(machine_prices = user_machine_prices, elec_costs = elec_costs)
     env_miners = MinerGenerator().generate_miner_distribution()
@@ -106,7 +106,7 @@ def get_user_opex_plots(user_positions, n_trials, title_suffix, machine_type, pa
     return (long_btc_fig, sell_daily_fig)
 
 
-def get_summary_plots_opex(price_params, fee_params, block_subsidy, n_trials, title_suffix, file_suffix, user_machine_prices = config.machine_prices, elec_costs = [0.04, 0.07], palette = opex_palette):
+def get_summary_plots_opex(price_params, fee_params, block_subsidy, n_trials, title_suffix, file_suffix, user_machine_prices = config.launch_machine_prices, elec_costs = [0.04, 0.07], palette = opex_palette):
     init_prices = PriceGenerator(price_params).generate_prices()
     user_miners_long_btc, user_miners_sell_daily = UserMinerGenerator().generate_user_miners(machine_prices = user_machine_prices, elec_costs = elec_costs)
     env_miners = MinerGenerator().generate_miner_distribution()
@@ -141,7 +141,8 @@ if __name__ == '__main__':
     n_trials = 25
 
     fee_params = CMDataLoader.get_historical_fee_params()
-    block_subsidy = 6.25
+    # None follows the halving schedule from the current block height
+    block_subsidy = None
 
     historical_price_params = CMDataLoader.get_historical_price_params()
     get_summary_plots(historical_price_params, fee_params, block_subsidy, n_trials, "with Historical Parameters", "historical")
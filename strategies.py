@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+
+from constants import Strategy, STRATEGY_SELL_FRACTIONS
+
+
+# Strategy steps map one day of (price, profit_usd, btc, usd, state, **params) to (btc_change, usd_change)
+# price and profit_usd are per path; btc, usd and params broadcast to (n_strategies, n_paths)
+# state is a dict the step can use to carry values between days
+
+# Sell fraction of each day's profit, hold the rest as BTC
+def sell_fraction_step(price, profit_usd, btc, usd, state, fraction):
+    return ((1 - fraction) * profit_usd / price, fraction * profit_usd)
+
+
+# Sell each day's profit, then buy up to amount_usd of BTC from USD holdings
+def dca_step(price, profit_usd, btc, usd, state, amount_usd):
+    buy_usd = np.clip(usd + profit_usd, 0, amount_usd)
+    return (buy_usd / price, profit_usd - buy_usd)
+
+
+# Sell fraction of each day's profit, hold the rest as BTC
+# Sell all BTC once price falls stop below its running peak, then track the peak from there
+def stop_loss_step(price, profit_usd, btc, usd, state, fraction, stop):
+    peak = np.maximum(state.get('peak', price), price)
+    is_stopped = price < (1 - stop) * peak
+    state['peak'] = np.where(is_stopped, price, peak)
+
+    btc_change, usd_change = sell_fraction_step(price, profit_usd, btc, usd, state, fraction)
+    return (np.where(is_stopped, -btc, btc_change), np.where(is_stopped, profit_usd + btc * price, usd_change))
+
+
+# Hold profit as BTC below lower times the starting price, sell all BTC above upper times it, and sell daily in between
+def hedge_step(price, profit_usd, btc, usd, state, lower, upper):
+    start_price = state.setdefault('start_price', price)
+    is_low = price < lower * start_price
+    is_high = price > upper * start_price
+
+    btc_change = np.where(is_low, profit_usd / price, np.where(is_high, -btc, 0))
+    usd_change = np.where(is_low, 0, np.where(is_high, profit_usd + btc * price, profit_usd))
+    return (btc_change, usd_change)
+
+
+# A family of strategies: one step function over the grid of all parameter combinations
+class StrategyGrid():
+    def __init__(self, name: str, step, **params):
+        self.name = name
+        self.step = step
+        grid = np.meshgrid(*[np.atleast_1d(values) for values in params.values()], indexing = 'ij')
+        # One row per strategy, so params broadcast against paths
+        self.params = {param: values.ravel()[:, None] for (param, values) in zip(params, grid)}
+
+    def __len__(self):
+        return len(next(iter(self.params.values()))) if self.params else 1
+
+    def get_params(self):
+        return pd.DataFrame({param: values[:, 0] for (param, values) in self.params.items()}, index = range(len(self)))
+
+    # Positions of every strategy on every path after each day, stepping through days once
+    # prices, profits_usd are (n_paths, n_days); yields btc, usd arrays of (n_strategies, n_paths)
+    def __step_days(self, prices, profits_usd):
+        prices = np.atleast_2d(prices)
+        profits_usd = np.atleast_2d(profits_usd)
+        n_paths, n_days = prices.shape
+
+        btc = np.zeros((len(self), n_paths))
+        usd = np.zeros((len(self), n_paths))
+        state = dict()
+        for day in range(n_days):
+            btc_change, usd_change = self.step(prices[:, day], profits_usd[:, day], btc, usd, state, **self.params)
+            btc = btc + btc_change
+            usd = usd + usd_change
+            yield (btc, usd)
+
+    # Final positions of every strategy on every path, keeping only the running position
+    # Returns btc, usd arrays of (n_strategies, n_paths)
+    def evaluate(self, prices, profits_usd):
+        n_paths = np.atleast_2d(prices).shape[0]
+        position = (np.zeros((len(self), n_paths)), np.zeros((len(self), n_paths)))
+        for day_position in self.__step_days(prices, profits_usd):
+            position = day_position
+        return position
+
+    # Daily positions of every strategy on every path, for plotting
+    # Returns btc, usd arrays of (n_strategies, n_paths, n_days), so keep grids and paths small
+    def evaluate_history(self, prices, profits_usd):
+        n_paths, n_days = np.atleast_2d(prices).shape
+        btc = np.zeros((len(self), n_paths, n_days))
+        usd = np.zeros((len(self), n_paths, n_days))
+        for (day, (day_btc, day_usd)) in enumerate(self.__step_days(prices, profits_usd)):
+            btc[:, :, day] = day_btc
+            usd[:, :, day] = day_usd
+        return (btc, usd)
+
+    def __repr__(self):
+        return f"StrategyGrid({self.name}, {len(self)})"
+
+
+# Built-in Strategy members as grids, matching Miner's position changes
+builtin_strategies = {strategy: StrategyGrid(strategy.value, sell_fraction_step, fraction = STRATEGY_SELL_FRACTIONS[strategy])
+                      for strategy in Strategy}
+
+
+# Scores every strategy in each grid by its final position value across paths
+# Returns one row per strategy, with its parameters
+def score_strategies(strategy_grids: list, prices, profits_usd):
+    prices = np.atleast_2d(prices)
+    scores = []
+    for strategy_grid in strategy_grids:
+        btc, usd = strategy_grid.evaluate(prices, profits_usd)
+        total_position_usd = usd + btc * prices[:, -1]
+        scores += [strategy_grid.get_params().assign(strategy = strategy_grid.name,
+                                                     mean_position_usd = total_position_usd.mean(axis = 1),
+                                                     std_position_usd = total_position_usd.std(axis = 1),
+                                                     p5_position_usd = np.percentile(total_position_usd, 5, axis = 1),
+                                                     p95_position_usd = np.percentile(total_position_usd, 95, axis = 1))]
+    return pd.concat(scores, ignore_index = True)